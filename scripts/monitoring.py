@@ -10,9 +10,298 @@ import json
 import sys
 import os
 import argparse
+import math
+from collections import deque
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+# Default location of the CloudFormation template holding the parameter groups
+DEFAULT_TEMPLATE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'cloudformation', 'infrastructure.yaml'
+)
+
+# PostgreSQL default for logical_decoding_work_mem (kB)
+DEFAULT_LOGICAL_DECODING_WORK_MEM_KB = 64 * 1024
+
+# Upper bound the advisor will recommend per walsender (kB)
+MAX_LOGICAL_DECODING_WORK_MEM_KB = 1024 * 1024
+
+# Counters exposed by pg_stat_replication_slots that are tracked as rates
+DECODING_COUNTERS = ('spill_txns', 'spill_bytes', 'stream_txns', 'stream_bytes', 'total_txns', 'total_bytes')
+
+
+def pearson_correlation(xs: List[float], ys: List[float]) -> Optional[float]:
+    """Pearson correlation of two equally sized series, None if undefined"""
+    if len(xs) != len(ys) or len(xs) < 3:
+        return None
+    
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    var_y = sum((y - mean_y) ** 2 for y in ys)
+    if var_x == 0 or var_y == 0:
+        return None
+    return cov / math.sqrt(var_x * var_y)
+
+
+def counters_reset(previous: Dict, current: Dict) -> bool:
+    """Whether decoding counters restarted between two samples of a slot"""
+    # Recreating a slot or pg_stat_reset_replication_slot() may leave stats_reset unchanged
+    if str(previous.get('stats_reset')) != str(current.get('stats_reset')):
+        return True
+    return any((current.get(counter) or 0) < (previous.get(counter) or 0) for counter in DECODING_COUNTERS)
+
+
+def format_bytes(value: Optional[float]) -> str:
+    """Format a byte count the way pg_size_pretty does"""
+    if value is None:
+        return 'N/A'
+    for unit in ('bytes', 'kB', 'MB', 'GB'):
+        if abs(value) < 1024:
+            return f"{value:.0f} {unit}" if unit == 'bytes' else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class MetricsHistory:
+    """JSONL metrics history with 1-minute and 1-hour rollup tiers"""
+    
+    TIERS = {'1m': timedelta(minutes=1), '1h': timedelta(hours=1)}
+    
+    # Aged records are removed in batches of this span so files are rewritten at most hourly
+    EXPIRY_STEP = timedelta(hours=1)
+    
+    def __init__(self, raw_file: str, raw_retention: timedelta = timedelta(hours=24),
+                 minute_retention: timedelta = timedelta(days=30)):
+        # Both tiers are built from raw samples, so raw data must outlive an hourly bucket
+        if raw_retention < 2 * self.TIERS['1h']:
+            raise ValueError("Raw retention must be at least 2 hours")
+        if minute_retention < raw_retention:
+            raise ValueError("Minute retention must not be shorter than raw retention")
+        
+        self.raw_file = raw_file
+        self.raw_retention = raw_retention
+        self.minute_retention = minute_retention
+        base, ext = os.path.splitext(raw_file)
+        self.tier_files = {tier: f"{base}.{tier}{ext or '.jsonl'}" for tier in self.TIERS}
+        self._pending = None
+        self.skipped_lines = 0
+    
+    @staticmethod
+    def _parse(line) -> Optional[Dict]:
+        """Decode one history line, None if it is not a timestamped record"""
+        try:
+            record = json.loads(line)
+            datetime.fromisoformat(record['timestamp'])
+            return record
+        except (ValueError, TypeError, KeyError):
+            return None
+    
+    def _skipped(self, path: str, count: int):
+        if count:
+            self.skipped_lines += count
+            print(f"Skipped {count} malformed line(s) in {path}")
+    
+    def _read(self, path: str) -> List[Dict]:
+        records = []
+        skipped = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = self._parse(line)
+                    if record is None:
+                        skipped += 1
+                    else:
+                        records.append(record)
+        self._skipped(path, skipped)
+        return records
+    
+    def _first_timestamp(self, path: str) -> Optional[datetime]:
+        """Timestamp of the first valid record in a file, reading only its head"""
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            for line in f:
+                record = self._parse(line) if line.strip() else None
+                if record is not None:
+                    return datetime.fromisoformat(record['timestamp'])
+        return None
+    
+    def _last_timestamp(self, path: str) -> Optional[datetime]:
+        """Timestamp of the last valid record in a file, reading only its tail"""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        with open(path, 'rb') as f:
+            f.seek(max(os.path.getsize(path) - 4096, 0))
+            lines = [line for line in f.read().splitlines() if line.strip()]
+        for line in reversed(lines):
+            record = self._parse(line)
+            if record is not None:
+                return datetime.fromisoformat(record['timestamp'])
+        return None
+    
+    def _expire(self, path: str, cutoff: datetime) -> int:
+        """Drop records older than cutoff, but only once a full expiry step has aged out"""
+        oldest = self._first_timestamp(path)
+        if oldest is None or oldest >= cutoff - self.EXPIRY_STEP:
+            return 0
+        
+        expired = 0
+        skipped = 0
+        tmp_path = f"{path}.tmp"
+        with open(path) as src, open(tmp_path, 'w') as dst:
+            for line in src:
+                if not line.strip():
+                    continue
+                record = self._parse(line)
+                # Malformed lines are dropped by the rewrite
+                if record is None:
+                    skipped += 1
+                elif datetime.fromisoformat(record['timestamp']) < cutoff:
+                    expired += 1
+                else:
+                    dst.write(line if line.endswith('\n') else line + '\n')
+        os.replace(tmp_path, path)
+        if skipped:
+            print(f"Dropped {skipped} malformed line(s) from {path}")
+        return expired
+    
+    @staticmethod
+    def _bucket_start(timestamp: datetime, width: timedelta) -> datetime:
+        epoch = datetime(1970, 1, 1)
+        return timestamp - (timestamp - epoch) % width
+    
+    @staticmethod
+    def aggregate(samples: List[Dict], bucket: datetime, resolution: str) -> Dict:
+        """Aggregate raw samples into a single rollup record"""
+        lags = [s['replication_lag_seconds'] for s in samples if s.get('replication_lag_seconds') is not None]
+        byte_rates = {}
+        for rate_name in ('total_bytes_per_sec', 'spill_bytes_per_sec', 'stream_bytes_per_sec'):
+            values = [
+                sum(slot['rates'].get(rate_name, 0) for slot in s['decoding_stats'])
+                for s in samples
+                if any(slot.get('rates') for slot in s.get('decoding_stats', []))
+            ]
+            byte_rates[rate_name] = {
+                'avg': sum(values) / len(values) if values else None,
+                'max': max(values) if values else None
+            }
+        alerts = [alert for s in samples for alert in s.get('alerts', [])]
+        
+        return {
+            'timestamp': bucket.isoformat(),
+            'resolution': resolution,
+            'samples': len(samples),
+            'replication_lag_seconds': {
+                'min': min(lags) if lags else None,
+                'max': max(lags) if lags else None,
+                'avg': sum(lags) / len(lags) if lags else None,
+                'p95': percentile(lags, 95)
+            },
+            'byte_rates': byte_rates,
+            'alerts': {
+                'total': len(alerts),
+                'warning': sum(1 for alert in alerts if alert['level'] == 'WARNING'),
+                'critical': sum(1 for alert in alerts if alert['level'] == 'CRITICAL')
+            }
+        }
+    
+    def append(self, metrics: Dict):
+        """Append a raw sample"""
+        line = json.dumps(metrics, default=str)
+        with open(self.raw_file, 'a+b') as f:
+            # Start on a fresh line if an earlier write was cut short
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    line = '\n' + line
+            f.write((line + '\n').encode())
+        if self._pending is not None:
+            self._pending.append(json.loads(line.lstrip('\n')))
+    
+    def _unrolled(self, samples: List[Dict]) -> List[Dict]:
+        """Samples whose hour is not yet in the hourly tier"""
+        last_hour = self._last_timestamp(self.tier_files['1h'])
+        if last_hour is None:
+            return samples
+        return [
+            sample for sample in samples
+            if self._bucket_start(datetime.fromisoformat(sample['timestamp']), self.TIERS['1h']) > last_hour
+        ]
+    
+    def rollup(self, now: Optional[datetime] = None) -> Dict:
+        """Roll completed buckets into the coarse tiers and expire aged data"""
+        now = now or datetime.now()
+        # The raw file is only scanned once; later samples are buffered by append()
+        if self._pending is None:
+            self._pending = self._unrolled(self._read(self.raw_file))
+        written = {}
+        
+        for tier, width in self.TIERS.items():
+            last_rolled = self._last_timestamp(self.tier_files[tier])
+            current_bucket = self._bucket_start(now, width)
+            buckets = {}
+            
+            for sample in self._pending:
+                bucket = self._bucket_start(datetime.fromisoformat(sample['timestamp']), width)
+                # Only complete buckets that are not already in the tier
+                if bucket < current_bucket and (last_rolled is None or bucket > last_rolled):
+                    buckets.setdefault(bucket, []).append(sample)
+            
+            with open(self.tier_files[tier], 'a') as f:
+                for bucket in sorted(buckets):
+                    f.write(json.dumps(self.aggregate(buckets[bucket], bucket, tier), default=str) + '\n')
+            written[tier] = len(buckets)
+        
+        self._pending = self._unrolled(self._pending)
+        
+        # Raw samples are only dropped once the hourly tier covers them
+        last_hour = self._last_timestamp(self.tier_files['1h'])
+        if last_hour is None:
+            written['raw_expired'] = 0
+        else:
+            raw_cutoff = min(now - self.raw_retention, last_hour + self.TIERS['1h'])
+            written['raw_expired'] = self._expire(self.raw_file, raw_cutoff)
+        written['1m_expired'] = self._expire(self.tier_files['1m'], now - self.minute_retention)
+        
+        return written
+    
+    def select_tier(self, start: datetime, end: Optional[datetime] = None) -> str:
+        """Pick the finest tier that still covers the range without scanning too much"""
+        now = datetime.now()
+        end = end or now
+        span = end - start
+        
+        if start >= now - self.raw_retention and span <= timedelta(hours=6):
+            return 'raw'
+        if start >= now - self.minute_retention and span <= timedelta(days=7):
+            return '1m'
+        return '1h'
+    
+    def query(self, start: datetime, end: Optional[datetime] = None, tier: Optional[str] = None) -> List[Dict]:
+        """Read records in [start, end) from a single tier"""
+        end = end or datetime.now()
+        tier = tier or self.select_tier(start, end)
+        path = self.raw_file if tier == 'raw' else self.tier_files[tier]
+        
+        return [
+            record for record in self._read(path)
+            if start <= datetime.fromisoformat(record['timestamp']) < end
+        ]
+
+
 class ReplicationMonitor:
     def __init__(self, primary_config: Dict, replica_config: Dict):
         self.primary_config = primary_config
@@ -20,6 +309,8 @@ class ReplicationMonitor:
         self.primary_conn = None
         self.replica_conn = None
         self.alerts = []
+        self.previous_decoding_stats = {}
+        self.spill_lag_window = deque(maxlen=120)
         
     def connect_databases(self) -> bool:
         """Establish connections to both databases"""
@@ -146,6 +437,76 @@ class ReplicationMonitor:
             print(f"Failed to get replication slot status: {e}")
             return []
     
+    def get_decoding_stats(self) -> List[Dict]:
+        """Get logical decoding spill/stream counters from primary"""
+        try:
+            with self.primary_conn.cursor() as cur:
+                cur.execute("""
+                    SELECT 
+                        slot_name,
+                        spill_txns,
+                        spill_bytes,
+                        stream_txns,
+                        stream_bytes,
+                        total_txns,
+                        total_bytes,
+                        stats_reset
+                    FROM pg_stat_replication_slots;
+                """)
+                results = cur.fetchall()
+                
+                stats = []
+                for row in results:
+                    stats.append({
+                        'slot_name': row[0],
+                        'spill_txns': row[1],
+                        'spill_bytes': row[2],
+                        'stream_txns': row[3],
+                        'stream_bytes': row[4],
+                        'total_txns': row[5],
+                        'total_bytes': row[6],
+                        'stats_reset': row[7]
+                    })
+                return stats
+        except Exception as e:
+            print(f"Failed to get logical decoding stats: {e}")
+            return []
+    
+    def calculate_decoding_rates(self, stats: List[Dict]) -> List[Dict]:
+        """Turn cumulative decoding counters into per-second rates per slot"""
+        now = time.monotonic()
+        current = {}
+        
+        for slot in stats:
+            previous = self.previous_decoding_stats.get(slot['slot_name'])
+            rates = {}
+            
+            if previous and not counters_reset(previous, slot):
+                elapsed = now - previous['sampled_at']
+                for counter in DECODING_COUNTERS:
+                    if elapsed > 0:
+                        rates[f"{counter}_per_sec"] = ((slot[counter] or 0) - (previous[counter] or 0)) / elapsed
+            
+            slot['rates'] = rates
+            current[slot['slot_name']] = dict(slot, sampled_at=now)
+        
+        self.previous_decoding_stats = current
+        return stats
+    
+    def correlate_spill_with_lag(self, metrics: Dict) -> Optional[float]:
+        """Correlate total spill byte rate with replication lag over recent samples"""
+        lag = metrics.get('replication_lag_seconds')
+        rates = [slot['rates'] for slot in metrics.get('decoding_stats', []) if slot['rates']]
+        
+        if lag is not None and rates:
+            spill_rate = sum(rate.get('spill_bytes_per_sec', 0) for rate in rates)
+            self.spill_lag_window.append((spill_rate, lag))
+        
+        return pearson_correlation(
+            [sample[0] for sample in self.spill_lag_window],
+            [sample[1] for sample in self.spill_lag_window]
+        )
+    
     def get_database_sizes(self) -> Dict:
         """Get database sizes for both primary and replica"""
         sizes = {}
@@ -239,6 +600,17 @@ class ReplicationMonitor:
                         'message': f"Replication slot '{slot['name']}' is not active"
                     })
         
+        # Check logical decoding spills
+        lag = metrics.get('replication_lag_seconds')
+        for slot in metrics.get('decoding_stats', []):
+            spill_rate = slot['rates'].get('spill_bytes_per_sec')
+            if spill_rate and lag is not None and lag > 60:
+                alerts.append({
+                    'level': 'WARNING',
+                    'message': f"Slot '{slot['slot_name']}' spilling {format_bytes(spill_rate)}/s to disk "
+                               f"while lag is {lag:.2f} seconds"
+                })
+        
         return alerts
     
     def collect_metrics(self) -> Dict:
@@ -250,8 +622,10 @@ class ReplicationMonitor:
             'subscription': self.get_subscription_status(),
             'replication_slots': self.get_replication_slot_status(),
             'database_sizes': self.get_database_sizes(),
-            'connections': self.check_connection_counts()
+            'connections': self.check_connection_counts(),
+            'decoding_stats': self.calculate_decoding_rates(self.get_decoding_stats())
         }
+        metrics['spill_lag_correlation'] = self.correlate_spill_with_lag(metrics)
         
         # Check for alerts
         metrics['alerts'] = self.check_alerts(metrics)
@@ -296,6 +670,23 @@ class ReplicationMonitor:
         else:
             print("   No replication slots found")
         
+        # Logical Decoding
+        print("\n💽 LOGICAL DECODING:")
+        decoding = metrics.get('decoding_stats', [])
+        if decoding:
+            for slot in decoding:
+                rates = slot['rates']
+                print(f"   {slot['slot_name']}: spilled {slot['spill_txns']} txns ({format_bytes(slot['spill_bytes'])}), "
+                      f"streamed {slot['stream_txns']} txns ({format_bytes(slot['stream_bytes'])})")
+                if rates:
+                    print(f"      Spill: {format_bytes(rates.get('spill_bytes_per_sec'))}/s, "
+                          f"Stream: {format_bytes(rates.get('stream_bytes_per_sec'))}/s, "
+                          f"Decoded: {format_bytes(rates.get('total_bytes_per_sec'))}/s")
+            if metrics.get('spill_lag_correlation') is not None:
+                print(f"   Spill/lag correlation: {metrics['spill_lag_correlation']:.2f}")
+        else:
+            print("   No decoding statistics available")
+        
         # Database Sizes
         print("\n💾 DATABASE SIZES:")
         sizes = metrics['database_sizes']
@@ -322,11 +713,19 @@ class ReplicationMonitor:
         else:
             print("\n✅ NO ALERTS")
     
-    def monitor_continuous(self, interval: int = 30, output_file: Optional[str] = None):
+    def monitor_continuous(self, interval: int = 30, output_file: Optional[str] = None,
+                           raw_retention_hours: int = 24, minute_retention_days: int = 30):
         """Run continuous monitoring"""
         print(f"Starting continuous monitoring (interval: {interval}s)")
+        history = None
         if output_file:
-            print(f"Logging to: {output_file}")
+            history = MetricsHistory(
+                output_file,
+                raw_retention=timedelta(hours=raw_retention_hours),
+                minute_retention=timedelta(days=minute_retention_days)
+            )
+            print(f"Logging to: {output_file} (rollups: {', '.join(history.tier_files.values())})")
+        last_rollup = None
         
         try:
             while True:
@@ -335,10 +734,17 @@ class ReplicationMonitor:
                 # Print to console
                 self.print_metrics(metrics)
                 
-                # Write to file if specified
-                if output_file:
-                    with open(output_file, 'a') as f:
-                        f.write(json.dumps(metrics, default=str) + '\n')
+                # Write to file if specified, rolling up once per minute
+                if history:
+                    history.append(metrics)
+                    minute = datetime.now().replace(second=0, microsecond=0)
+                    if minute != last_rollup:
+                        # A failed rollup is retried next minute; sampling carries on
+                        try:
+                            history.rollup()
+                        except Exception as e:
+                            print(f"History rollup failed: {e}")
+                        last_rollup = minute
                 
                 time.sleep(interval)
                 
@@ -354,15 +760,240 @@ class ReplicationMonitor:
         if self.replica_conn:
             self.replica_conn.close()
 
+def load_parameter_group(template_path: str, resource: str = 'DBClusterParameterGroup') -> Dict:
+    """Read the family and parameters of a parameter group from the CloudFormation template"""
+    group = {'family': None, 'parameters': {}}
+    in_resource = in_parameters = False
+    
+    # The template uses CloudFormation tags (!Sub, !Ref), so read the block by indentation
+    with open(template_path) as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            indent = len(line) - len(line.lstrip())
+            
+            if indent == 2:
+                in_resource = stripped == f"{resource}:"
+                in_parameters = False
+            elif in_resource and indent == 6:
+                in_parameters = stripped == 'Parameters:'
+                if stripped.startswith('Family:'):
+                    group['family'] = stripped.split(':', 1)[1].strip()
+            elif in_parameters and indent == 8 and ':' in stripped:
+                name, value = stripped.split(':', 1)
+                group['parameters'][name.strip()] = value.strip().strip("'\"")
+    
+    return group
+
+
+def analyze_decoding_history(samples: List[Dict]) -> Dict:
+    """Summarise spill/stream volume per slot across a metrics history"""
+    slots = {}
+    lag_points = []
+    
+    for sample in samples:
+        spill_rate = 0.0
+        has_rates = False
+        
+        for slot in sample.get('decoding_stats', []):
+            summary = slots.setdefault(slot['slot_name'], {
+                'last': slot, 'peak_spill_bytes_per_sec': 0.0,
+                **{counter: 0 for counter in DECODING_COUNTERS}
+            })
+            # Sum deltas between samples, skipping intervals in which the counters restarted
+            previous = summary['last']
+            if not counters_reset(previous, slot):
+                for counter in DECODING_COUNTERS:
+                    summary[counter] += (slot.get(counter) or 0) - (previous.get(counter) or 0)
+            summary['last'] = slot
+            
+            rates = slot.get('rates') or {}
+            if rates:
+                has_rates = True
+                spill_rate += rates.get('spill_bytes_per_sec', 0)
+                summary['peak_spill_bytes_per_sec'] = max(
+                    summary['peak_spill_bytes_per_sec'], rates.get('spill_bytes_per_sec', 0)
+                )
+        
+        if has_rates and sample.get('replication_lag_seconds') is not None:
+            lag_points.append((spill_rate, sample['replication_lag_seconds']))
+    
+    for summary in slots.values():
+        summary.pop('last')
+    
+    return {
+        'samples': len(samples),
+        'slots': slots,
+        'spill_lag_correlation': pearson_correlation(
+            [point[0] for point in lag_points], [point[1] for point in lag_points]
+        )
+    }
+
+
+def recommend_decoding_settings(analysis: Dict, parameter_group: Dict) -> Dict:
+    """Recommend logical_decoding_work_mem and subscription streaming settings"""
+    configured = parameter_group['parameters'].get('logical_decoding_work_mem')
+    current_kb = int(configured) if configured else DEFAULT_LOGICAL_DECODING_WORK_MEM_KB
+    
+    family = parameter_group.get('family') or ''
+    major_version = int(''.join(c for c in family if c.isdigit()) or 0)
+    streaming_mode = 'parallel' if major_version >= 16 else 'on'
+    
+    recommendations = {
+        'parameter_group_family': family,
+        'current_logical_decoding_work_mem_kb': current_kb,
+        'configured_in_template': configured is not None,
+        'recommended_logical_decoding_work_mem_kb': current_kb,
+        'recommended_streaming': None,
+        'slots': {},
+        'notes': []
+    }
+    
+    for slot_name, summary in analysis['slots'].items():
+        spill_txns = summary['spill_txns']
+        total_txns = summary['total_txns']
+        spill_ratio = spill_txns / total_txns if total_txns else 0.0
+        avg_spill_kb = summary['spill_bytes'] / spill_txns / 1024 if spill_txns else 0.0
+        
+        slot_advice = {
+            'spill_ratio': spill_ratio,
+            'avg_spill_kb_per_txn': avg_spill_kb,
+            'streamed_txns': summary['stream_txns'],
+            'action': 'keep'
+        }
+        
+        if spill_txns and spill_ratio >= 0.01:
+            # A spilled transaction held work_mem before spilling the rest
+            needed_kb = current_kb + avg_spill_kb
+            if needed_kb <= MAX_LOGICAL_DECODING_WORK_MEM_KB:
+                target_kb = current_kb
+                while target_kb < needed_kb:
+                    target_kb *= 2
+                slot_advice['action'] = 'raise_work_mem'
+                recommendations['recommended_logical_decoding_work_mem_kb'] = max(
+                    recommendations['recommended_logical_decoding_work_mem_kb'], target_kb
+                )
+            else:
+                slot_advice['action'] = 'enable_streaming'
+                recommendations['recommended_streaming'] = streaming_mode
+        
+        recommendations['slots'][slot_name] = slot_advice
+    
+    recommended_kb = recommendations['recommended_logical_decoding_work_mem_kb']
+    if recommended_kb != current_kb:
+        recommendations['notes'].append(
+            f"Set logical_decoding_work_mem: {recommended_kb} in DBClusterParameterGroup "
+            f"(the limit applies per walsender, {len(analysis['slots'])} slot(s) observed)"
+        )
+    if recommendations['recommended_streaming']:
+        recommendations['notes'].append(
+            f"ALTER SUBSCRIPTION <name> SET (streaming = {streaming_mode}); "
+            f"transactions too large for memory are then streamed instead of spilled"
+        )
+    if recommendations['recommended_streaming'] and major_version and major_version < 16:
+        recommendations['notes'].append(
+            f"streaming = parallel requires PostgreSQL 16 (family is {family})"
+        )
+    correlation = analysis['spill_lag_correlation']
+    if correlation is not None and correlation >= 0.5:
+        recommendations['notes'].append(
+            f"Spill volume tracks replication lag (correlation {correlation:.2f})"
+        )
+    
+    return recommendations
+
+
+def load_history(history_file: str) -> List[Dict]:
+    """Load metrics samples written by monitor_continuous"""
+    samples = []
+    with open(history_file) as f:
+        for line in f:
+            if line.strip():
+                samples.append(json.loads(line))
+    return samples
+
+
+def print_decoding_report(analysis: Dict, recommendations: Dict):
+    """Print the logical decoding advisor report"""
+    print(f"\n{'='*80}")
+    print(f"Logical Decoding Advisor - {analysis['samples']} samples")
+    print(f"{'='*80}")
+    
+    print("\n💽 OBSERVED SPILL/STREAM VOLUME:")
+    if not analysis['slots']:
+        print("   No decoding statistics in history")
+    for slot_name, summary in analysis['slots'].items():
+        advice = recommendations['slots'][slot_name]
+        print(f"   {slot_name}: {summary['spill_txns']}/{summary['total_txns']} txns spilled "
+              f"({advice['spill_ratio']:.1%}), {format_bytes(summary['spill_bytes'])} spilled, "
+              f"{format_bytes(summary['stream_bytes'])} streamed")
+        print(f"      Peak spill rate: {format_bytes(summary['peak_spill_bytes_per_sec'])}/s, "
+              f"avg spill per txn: {format_bytes(advice['avg_spill_kb_per_txn'] * 1024)}")
+    
+    if analysis['spill_lag_correlation'] is not None:
+        print(f"   Spill/lag correlation: {analysis['spill_lag_correlation']:.2f}")
+    
+    print("\n⚙️  SETTINGS:")
+    source = 'template' if recommendations['configured_in_template'] else 'PostgreSQL default'
+    print(f"   Current logical_decoding_work_mem: "
+          f"{recommendations['current_logical_decoding_work_mem_kb']} kB ({source})")
+    print(f"   Recommended logical_decoding_work_mem: "
+          f"{recommendations['recommended_logical_decoding_work_mem_kb']} kB")
+    print(f"   Recommended subscription streaming: {recommendations['recommended_streaming'] or 'unchanged'}")
+    
+    if recommendations['notes']:
+        print("\n📝 RECOMMENDATIONS:")
+        for note in recommendations['notes']:
+            print(f"   - {note}")
+
+
 def main():
     """Main function"""
     parser = argparse.ArgumentParser(description='PostgreSQL Replication Monitor')
     parser.add_argument('--interval', type=int, default=30, help='Monitoring interval in seconds (default: 30)')
     parser.add_argument('--output', type=str, help='Output file for JSON logs')
     parser.add_argument('--once', action='store_true', help='Run once and exit')
+    parser.add_argument('--decoding-report', type=str, metavar='HISTORY',
+                        help='Analyse a JSON log history and recommend logical decoding settings')
+    parser.add_argument('--template', type=str, default=DEFAULT_TEMPLATE,
+                        help='CloudFormation template with the parameter groups')
+    parser.add_argument('--raw-retention', type=int, default=24,
+                        help='Hours of raw samples to keep in the JSON log (default: 24)')
+    parser.add_argument('--minute-retention', type=int, default=30,
+                        help='Days of 1-minute rollups to keep (default: 30)')
+    parser.add_argument('--history', type=float, metavar='HOURS',
+                        help='Print rollups covering the last HOURS from the JSON log and exit')
     
     args = parser.parse_args()
     
+    if args.raw_retention < 2:
+        parser.error('--raw-retention must be at least 2 hours')
+    if args.minute_retention * 24 < args.raw_retention:
+        parser.error('--minute-retention must cover at least --raw-retention')
+    
+    if args.history:
+        if not args.output:
+            parser.error('--history requires --output')
+        history = MetricsHistory(
+            args.output,
+            raw_retention=timedelta(hours=args.raw_retention),
+            minute_retention=timedelta(days=args.minute_retention)
+        )
+        start = datetime.now() - timedelta(hours=args.history)
+        for record in history.query(start):
+            print(json.dumps(record, default=str))
+        return
+    
+    if args.decoding_report:
+        analysis = analyze_decoding_history(load_history(args.decoding_report))
+        recommendations = recommend_decoding_settings(analysis, load_parameter_group(args.template))
+        print_decoding_report(analysis, recommendations)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'analysis': analysis, 'recommendations': recommendations}, f, indent=2, default=str)
+        return
+    
     # Database configuration
     primary_config = {
         'host': os.getenv('PRIMARY_HOST', 'localhost'),
@@ -397,7 +1028,7 @@ def main():
                     json.dump(metrics, f, indent=2, default=str)
         else:
             # Continuous monitoring
-            monitor.monitor_continuous(args.interval, args.output)
+            monitor.monitor_continuous(args.interval, args.output, args.raw_retention, args.minute_retention)
             
     finally:
         monitor.close_connections()
@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+PostgreSQL Logical Replication Publication Sharding Advisor
+Splits a single publication into balanced publication/subscription pairs
+so changes are applied by several apply workers on the replica
+"""
+
+import psycopg2
+import time
+import json
+import sys
+import os
+import argparse
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Shown in printed/saved DDL when the existing subscription's conninfo is unavailable
+PLACEHOLDER_CONNINFO = ('host=<PRIMARY_ENDPOINT> port=5432 dbname=replication_demo '
+                        'user=replicator password=<PASSWORD> sslmode=require')
+
+
+def quote_ident(name: str) -> str:
+    """Quote an SQL identifier"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def mask_password(conninfo: str) -> str:
+    """Hide the password in a libpq keyword/value or URI connection string"""
+    if re.match(r"\s*postgres(?:ql)?://", conninfo):
+        conninfo = re.sub(r"(://[^:@/?\s]*:)[^@/?\s]*@", r"\1********@", conninfo)
+        return re.sub(r"([?&]password=)[^&#\s]*", r"\1********", conninfo)
+    return re.sub(r"(password\s*=\s*)('(?:[^'\\]|\\.)*'|\S+)", r"\1********", conninfo)
+
+
+def subscription_options(subscription: Dict) -> List[str]:
+    """WITH options that reproduce a pg_subscription row's settings, for the columns the server has"""
+    options = []
+    
+    if 'subbinary' in subscription:
+        options.append(f"binary = {str(subscription['subbinary']).lower()}")
+    if 'substream' in subscription:
+        # Boolean before PostgreSQL 16, then 'f', 't' or 'p' (parallel)
+        stream = subscription['substream']
+        streaming = {True: 'on', False: 'off', 't': 'on', 'f': 'off', 'p': 'parallel'}[stream]
+        options.append(f"streaming = {streaming}")
+    if 'subtwophasestate' in subscription:
+        options.append(f"two_phase = {'false' if subscription['subtwophasestate'] == 'd' else 'true'}")
+    if 'subdisableonerr' in subscription:
+        options.append(f"disable_on_error = {str(subscription['subdisableonerr']).lower()}")
+    if subscription.get('subsynccommit'):
+        options.append(f"synchronous_commit = '{subscription['subsynccommit']}'")
+    if subscription.get('suborigin'):
+        options.append(f"origin = {subscription['suborigin']}")
+    if 'subpasswordrequired' in subscription:
+        options.append(f"password_required = {str(subscription['subpasswordrequired']).lower()}")
+    if 'subrunasowner' in subscription:
+        options.append(f"run_as_owner = {str(subscription['subrunasowner']).lower()}")
+    if 'subfailover' in subscription:
+        options.append(f"failover = {str(subscription['subfailover']).lower()}")
+    
+    return options
+
+
+def qualified_name(table: Tuple[str, str]) -> str:
+    """Quote a (schema, table) pair"""
+    return f"{quote_ident(table[0])}.{quote_ident(table[1])}"
+
+
+def group_related_tables(tables: List[Tuple[str, str]], foreign_keys: List[Tuple]) -> List[List[Tuple[str, str]]]:
+    """Group tables connected by foreign keys so they replicate through the same subscription"""
+    parent = {table: table for table in tables}
+    
+    def find(table):
+        while parent[table] != table:
+            parent[table] = parent[parent[table]]
+            table = parent[table]
+        return table
+    
+    for child, referenced in foreign_keys:
+        # Only keys between two published tables constrain the split
+        if child in parent and referenced in parent:
+            parent[find(child)] = find(referenced)
+    
+    groups = {}
+    for table in tables:
+        groups.setdefault(find(table), []).append(table)
+    return [sorted(group) for group in groups.values()]
+
+
+def plan_shards(groups: List[List[Tuple[str, str]]], volumes: Dict[Tuple[str, str], float], shards: int) -> List[Dict]:
+    """Assign table groups to shards, heaviest group first onto the lightest shard"""
+    plan = [{'tables': [], 'changes_per_sec': 0.0} for _ in range(shards)]
+    
+    weighted = sorted(
+        groups,
+        key=lambda group: (sum(volumes.get(table, 0.0) for table in group), len(group)),
+        reverse=True
+    )
+    for group in weighted:
+        target = min(plan, key=lambda shard: (shard['changes_per_sec'], len(shard['tables'])))
+        target['tables'].extend(group)
+        target['changes_per_sec'] += sum(volumes.get(table, 0.0) for table in group)
+    
+    return [shard for shard in plan if shard['tables']]
+
+
+class PublicationShardingAdvisor:
+    def __init__(self, primary_config: Dict, replica_config: Dict,
+                 publication: str = 'my_publication', subscription: str = 'my_subscription',
+                 prefix: str = 'shard'):
+        self.primary_config = primary_config
+        self.replica_config = replica_config
+        self.publication = publication
+        self.subscription = subscription
+        self.prefix = prefix
+        self.primary_conn = None
+        self.replica_conn = None
+    
+    def connect_databases(self) -> bool:
+        """Establish connections to both primary and replica databases"""
+        try:
+            self.primary_conn = psycopg2.connect(**self.primary_config)
+            self.primary_conn.autocommit = True
+            print("✓ Connected to primary database")
+            
+            self.replica_conn = psycopg2.connect(**self.replica_config)
+            self.replica_conn.autocommit = True
+            print("✓ Connected to replica database")
+            
+            return True
+        except Exception as e:
+            print(f"✗ Database connection failed: {e}")
+            return False
+    
+    def get_published_tables(self) -> List[Tuple[str, str]]:
+        """Get tables currently replicated through the publication"""
+        with self.primary_conn.cursor() as cur:
+            cur.execute("""
+                SELECT schemaname, tablename
+                FROM pg_publication_tables
+                WHERE pubname = %s
+                ORDER BY schemaname, tablename;
+            """, (self.publication,))
+            return [tuple(row) for row in cur.fetchall()]
+    
+    def get_foreign_keys(self) -> List[Tuple[Tuple[str, str], Tuple[str, str]]]:
+        """Get (child, referenced) table pairs for all foreign keys on primary"""
+        with self.primary_conn.cursor() as cur:
+            cur.execute("""
+                SELECT
+                    child_ns.nspname, child.relname,
+                    ref_ns.nspname, ref.relname
+                FROM pg_constraint con
+                JOIN pg_class child ON child.oid = con.conrelid
+                JOIN pg_namespace child_ns ON child_ns.oid = child.relnamespace
+                JOIN pg_class ref ON ref.oid = con.confrelid
+                JOIN pg_namespace ref_ns ON ref_ns.oid = ref.relnamespace
+                WHERE con.contype = 'f';
+            """)
+            return [((row[0], row[1]), (row[2], row[3])) for row in cur.fetchall()]
+    
+    @staticmethod
+    def _change_counts(conn) -> Dict[Tuple[str, str], int]:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT schemaname, relname, n_tup_ins + n_tup_upd + n_tup_del
+                FROM pg_stat_user_tables;
+            """)
+            return {(row[0], row[1]): row[2] for row in cur.fetchall()}
+    
+    def measure_change_volume(self, tables: List[Tuple[str, str]], interval: int) -> Dict[Tuple[str, str], float]:
+        """Measure per-table change rate on primary, or cumulative changes if interval is 0"""
+        before = self._change_counts(self.primary_conn)
+        if interval <= 0:
+            return {table: float(before.get(table, 0)) for table in tables}
+        
+        print(f"⏳ Sampling table change volume ({interval} seconds)...")
+        time.sleep(interval)
+        after = self._change_counts(self.primary_conn)
+        
+        return {
+            table: max(after.get(table, 0) - before.get(table, 0), 0) / interval
+            for table in tables
+        }
+    
+    def check_worker_capacity(self, shards: int) -> List[str]:
+        """Check that the clusters can run one apply worker and slot per shard"""
+        warnings = []
+        
+        with self.replica_conn.cursor() as cur:
+            cur.execute("SHOW max_logical_replication_workers;")
+            max_workers = int(cur.fetchone()[0])
+        if shards > max_workers:
+            warnings.append(
+                f"{shards} subscriptions need {shards} apply workers, "
+                f"max_logical_replication_workers is {max_workers} on replica"
+            )
+        
+        with self.primary_conn.cursor() as cur:
+            cur.execute("SHOW max_replication_slots;")
+            max_slots = int(cur.fetchone()[0])
+            cur.execute("SELECT COUNT(*) FROM pg_replication_slots;")
+            used_slots = cur.fetchone()[0]
+        # The existing subscription's slot is only released after cutover
+        if used_slots + shards > max_slots:
+            warnings.append(
+                f"Migration needs {shards} new slots, {max_slots - used_slots} of "
+                f"max_replication_slots ({max_slots}) are free on primary"
+            )
+        
+        return warnings
+    
+    def get_subscription_info(self) -> Optional[Dict]:
+        """Get the pg_subscription row of the existing subscription, with the columns of this server version"""
+        try:
+            with self.replica_conn.cursor() as cur:
+                cur.execute(
+                    "SELECT to_jsonb(s) FROM pg_subscription s WHERE subname = %s;",
+                    (self.subscription,)
+                )
+                result = cur.fetchone()
+                if result:
+                    return result[0]
+                print(f"⚠ Subscription '{self.subscription}' not found")
+        except Exception as e:
+            print(f"⚠ Unable to read subscription '{self.subscription}': {e}")
+        return None
+    
+    def shard_name(self, index: int) -> str:
+        return f"{self.prefix}_{index + 1}"
+    
+    def build_plan(self, shards: int, interval: int) -> Dict:
+        """Propose a balanced split of the published tables"""
+        tables = self.get_published_tables()
+        if not tables:
+            raise RuntimeError(f"Publication '{self.publication}' has no tables")
+        
+        volumes = self.measure_change_volume(tables, interval)
+        groups = group_related_tables(tables, self.get_foreign_keys())
+        assignments = plan_shards(groups, volumes, shards)
+        
+        return {
+            'generated_at': datetime.now().isoformat(),
+            'publication': self.publication,
+            'subscription': self.subscription,
+            'volume_unit': 'changes/sec' if interval > 0 else 'changes (cumulative)',
+            'shards': [
+                {
+                    'name': self.shard_name(i),
+                    'tables': ['.'.join(table) for table in shard['tables']],
+                    'changes_per_sec': shard['changes_per_sec']
+                }
+                for i, shard in enumerate(assignments)
+            ],
+            'warnings': self.check_worker_capacity(len(assignments))
+        }
+    
+    def generate_ddl(self, plan: Dict, subscription: Optional[Dict] = None, mask: bool = True) -> Dict[str, List[str]]:
+        """Generate the shard DDL, masking the password unless it is generated for execution"""
+        if subscription is None and mask:
+            subscription = self.get_subscription_info()
+        subscription = subscription or {}
+        
+        conninfo = subscription.get('subconninfo')
+        if not conninfo:
+            conninfo = PLACEHOLDER_CONNINFO
+        elif mask:
+            conninfo = mask_password(conninfo)
+        conninfo = conninfo.replace("'", "''")
+        # Carry the old subscription's settings (streaming, binary, ...) over to every shard
+        options = ', '.join(
+            ['copy_data = false', 'create_slot = true', 'enabled = false'] + subscription_options(subscription)
+        )
+        primary, replica = [], []
+        
+        for shard in plan['shards']:
+            tables = ', '.join(qualified_name(tuple(table.split('.', 1))) for table in shard['tables'])
+            primary.append(f"CREATE PUBLICATION {quote_ident(shard['name'])} FOR TABLE {tables};")
+            # Created disabled without initial copy; the origin is advanced before enabling
+            replica.append(
+                f"CREATE SUBSCRIPTION {quote_ident(shard['name'])} "
+                f"CONNECTION '{conninfo}' "
+                f"PUBLICATION {quote_ident(shard['name'])} "
+                f"WITH ({options});"
+            )
+        
+        return {'primary': primary, 'replica': replica}
+    
+    def _wait_for(self, conn, query: str, params: Tuple, timeout: int, description: str):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                if cur.fetchone()[0]:
+                    return
+            time.sleep(1)
+        raise RuntimeError(f"Timed out waiting for {description}")
+    
+    def apply_plan(self, plan: Dict, timeout: int = 300) -> bool:
+        """Migrate from the single subscription to the shard subscriptions without gaps"""
+        subscription = self.get_subscription_info()
+        if not subscription or not subscription.get('subconninfo') or not subscription.get('subslotname'):
+            print(f"✗ Cannot read the connection string and slot of '{self.subscription}'; no changes made")
+            return False
+        old_slot = subscription['subslotname']
+        
+        ddl = self.generate_ddl(plan, subscription, mask=False)
+        names = [shard['name'] for shard in plan['shards']]
+        
+        try:
+            with self.primary_conn.cursor() as cur:
+                for statement in ddl['primary']:
+                    cur.execute(statement)
+            print(f"✓ Created {len(names)} publications on primary")
+            
+            # Creating the subscriptions creates their slots at the current WAL position
+            with self.replica_conn.cursor() as cur:
+                for statement in ddl['replica']:
+                    cur.execute(statement)
+            print(f"✓ Created {len(names)} disabled subscriptions on replica")
+            
+            with self.primary_conn.cursor() as cur:
+                cur.execute("""
+                    SELECT MAX(confirmed_flush_lsn) FROM pg_replication_slots
+                    WHERE slot_name = ANY(%s);
+                """, (names,))
+                slots_lsn = cur.fetchone()[0]
+            
+            # The old subscription must have applied everything before the new slots start
+            print(f"⏳ Waiting for '{self.subscription}' to pass {slots_lsn}...")
+            self._wait_for(self.primary_conn, """
+                SELECT bool_or(confirmed_flush_lsn >= %s::pg_lsn) FROM pg_replication_slots
+                WHERE slot_name = %s;
+            """, (slots_lsn, old_slot), timeout, f"'{self.subscription}' to catch up")
+            
+            with self.replica_conn.cursor() as cur:
+                cur.execute(f"ALTER SUBSCRIPTION {quote_ident(self.subscription)} DISABLE;")
+            self._wait_for(self.replica_conn, """
+                SELECT COUNT(*) = 0 FROM pg_stat_subscription
+                WHERE subname = %s AND pid IS NOT NULL;
+            """, (self.subscription,), timeout, f"'{self.subscription}' apply worker to stop")
+            print(f"✓ Disabled subscription '{self.subscription}'")
+            
+            with self.replica_conn.cursor() as cur:
+                cur.execute("""
+                    SELECT os.remote_lsn
+                    FROM pg_replication_origin_status os
+                    JOIN pg_subscription s ON os.external_id = 'pg_' || s.oid
+                    WHERE s.subname = %s;
+                """, (self.subscription,))
+                applied_lsn = cur.fetchone()[0]
+                print(f"✓ '{self.subscription}' stopped at {applied_lsn}")
+                
+                # Skip what the old subscription already applied, stream everything after it
+                for name in names:
+                    cur.execute("""
+                        SELECT pg_replication_origin_advance('pg_' || oid, %s::pg_lsn)
+                        FROM pg_subscription WHERE subname = %s;
+                    """, (applied_lsn, name))
+                    cur.execute(f"ALTER SUBSCRIPTION {quote_ident(name)} ENABLE;")
+                print(f"✓ Enabled {len(names)} subscriptions from {applied_lsn}")
+                
+                # Dropping the old subscription also drops its slot on primary
+                cur.execute(f"DROP SUBSCRIPTION {quote_ident(self.subscription)};")
+                print(f"✓ Dropped subscription '{self.subscription}'")
+            
+            return True
+        except Exception as e:
+            print(f"✗ Migration failed: {e}")
+            print(f"  Subscription '{self.subscription}' is left in place; re-enable it and drop "
+                  f"the {self.prefix}_* subscriptions and publications to roll back")
+            return False
+    
+    def benchmark_apply(self, duration: int, subscriptions: List[str]) -> Dict:
+        """Measure apply throughput on replica against change rate on primary"""
+        primary_before = self._change_counts(self.primary_conn)
+        replica_before = self._change_counts(self.replica_conn)
+        max_lag = None
+        
+        deadline = time.time() + duration
+        while time.time() < deadline:
+            with self.replica_conn.cursor() as cur:
+                cur.execute("""
+                    SELECT MAX(EXTRACT(EPOCH FROM (now() - latest_end_time)))
+                    FROM pg_stat_subscription
+                    WHERE subname = ANY(%s) AND latest_end_time IS NOT NULL;
+                """, (subscriptions,))
+                lag = cur.fetchone()[0]
+                if lag is not None:
+                    max_lag = max(float(lag), max_lag or 0.0)
+            time.sleep(1)
+        
+        primary_after = self._change_counts(self.primary_conn)
+        replica_after = self._change_counts(self.replica_conn)
+        
+        def rate(before, after):
+            return sum(max(after[t] - before.get(t, 0), 0) for t in after) / duration
+        
+        return {
+            'subscriptions': subscriptions,
+            'duration_seconds': duration,
+            'primary_changes_per_sec': rate(primary_before, primary_after),
+            'applied_changes_per_sec': rate(replica_before, replica_after),
+            'max_lag_seconds': max_lag
+        }
+    
+    def close_connections(self):
+        """Close database connections"""
+        if self.primary_conn:
+            self.primary_conn.close()
+        if self.replica_conn:
+            self.replica_conn.close()
+
+
+def print_plan(plan: Dict, ddl: Dict[str, List[str]]):
+    """Print the proposed split and its DDL"""
+    print(f"\n{'='*80}")
+    print(f"Publication Sharding Plan - {plan['publication']} -> {len(plan['shards'])} shards")
+    print(f"{'='*80}")
+    
+    for shard in plan['shards']:
+        print(f"\n📦 {shard['name']}: {shard['changes_per_sec']:.2f} {plan['volume_unit']}")
+        for table in shard['tables']:
+            print(f"   {table}")
+    
+    if plan['warnings']:
+        print("\n⚠️  WARNINGS:")
+        for warning in plan['warnings']:
+            print(f"   {warning}")
+    
+    print("\n-- Run on PRIMARY")
+    for statement in ddl['primary']:
+        print(statement)
+    print("\n-- Run on REPLICA")
+    for statement in ddl['replica']:
+        print(statement)
+
+
+def print_benchmark(label: str, result: Dict):
+    """Print apply throughput benchmark results"""
+    lag = f"{result['max_lag_seconds']:.2f}s" if result['max_lag_seconds'] is not None else 'N/A'
+    print(f"📊 {label}: applied {result['applied_changes_per_sec']:.1f} changes/sec "
+          f"(primary {result['primary_changes_per_sec']:.1f}/sec), max lag {lag}")
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='PostgreSQL Publication Sharding Advisor')
+    parser.add_argument('--shards', type=int, default=2, help='Number of publication/subscription pairs (default: 2)')
+    parser.add_argument('--sample-interval', type=int, default=60,
+                        help='Seconds to sample table change rates, 0 uses cumulative counts (default: 60)')
+    parser.add_argument('--publication', type=str, default='my_publication', help='Publication to split')
+    parser.add_argument('--subscription', type=str, default='my_subscription', help='Subscription to replace')
+    parser.add_argument('--prefix', type=str, default='shard', help='Name prefix for new publications/subscriptions')
+    parser.add_argument('--output', type=str, help='Output file for the JSON plan and DDL')
+    parser.add_argument('--apply', action='store_true', help='Apply the plan and cut over to the new subscriptions')
+    parser.add_argument('--benchmark', type=int, default=0, metavar='SECONDS',
+                        help='Benchmark apply throughput for SECONDS before and after applying')
+    parser.add_argument('--timeout', type=int, default=300, help='Seconds to wait for catch-up during cutover')
+    
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error('--shards must be at least 1')
+    
+    # Database configuration
+    primary_config = {
+        'host': os.getenv('PRIMARY_HOST', 'localhost'),
+        'port': int(os.getenv('PRIMARY_PORT', '5432')),
+        'database': os.getenv('DB_NAME', 'replication_demo'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', 'password'),
+        'sslmode': 'require'
+    }
+    
+    replica_config = {
+        'host': os.getenv('REPLICA_HOST', 'localhost'),
+        'port': int(os.getenv('REPLICA_PORT', '5432')),
+        'database': os.getenv('DB_NAME', 'replication_demo'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', 'password'),
+        'sslmode': 'require'
+    }
+    
+    advisor = PublicationShardingAdvisor(
+        primary_config, replica_config, args.publication, args.subscription, args.prefix
+    )
+    
+    try:
+        if not advisor.connect_databases():
+            sys.exit(1)
+        
+        plan = advisor.build_plan(args.shards, args.sample_interval)
+        ddl = advisor.generate_ddl(plan)
+        print_plan(plan, ddl)
+        
+        report = {'plan': plan, 'ddl': ddl}
+        success = True
+        
+        if args.apply:
+            if plan['warnings']:
+                print("\n✗ Not applying plan with warnings")
+                sys.exit(1)
+            
+            if args.benchmark:
+                print(f"\n⏱️  Benchmarking apply throughput before migration ({args.benchmark} seconds)...")
+                report['benchmark_before'] = advisor.benchmark_apply(args.benchmark, [args.subscription])
+                print_benchmark('Before', report['benchmark_before'])
+            
+            print("\n🔀 Migrating to sharded subscriptions...")
+            success = advisor.apply_plan(plan, args.timeout)
+            
+            if success and args.benchmark:
+                print(f"\n⏱️  Benchmarking apply throughput after migration ({args.benchmark} seconds)...")
+                report['benchmark_after'] = advisor.benchmark_apply(
+                    args.benchmark, [shard['name'] for shard in plan['shards']]
+                )
+                print_benchmark('Before', report['benchmark_before'])
+                print_benchmark('After', report['benchmark_after'])
+        
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2, default=str)
+        
+        sys.exit(0 if success else 1)
+    finally:
+        advisor.close_connections()
+
+if __name__ == "__main__":
+    main()
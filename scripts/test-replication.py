@@ -9,87 +9,146 @@ import time
 import json
 import sys
 import os
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 
 class ReplicationTester:
-    def __init__(self, primary_config: Dict, replica_config: Dict):
+    # Keeps output from clusters validated in parallel from interleaving mid-line
+    _print_lock = threading.Lock()
+    
+    def __init__(self, primary_config: Dict, replica_config: Dict, name: Optional[str] = None):
         self.primary_config = primary_config
         self.replica_config = replica_config
+        self.name = name
         self.primary_conn = None
         self.replica_conn = None
+        self.catalog = {}
+        self.results = []
+        self.stats = {}
+        self.errors = {}
+        self._step = threading.local()
         
-    def connect_databases(self) -> bool:
-        """Establish connections to both primary and replica databases"""
+    def log(self, message: str):
+        """Print a message, prefixing every line with the cluster name when validating several clusters"""
+        if self.name:
+            message = '\n'.join(f"[{self.name}] {line}" for line in message.splitlines())
+        with self._print_lock:
+            print(message)
+    
+    def fail(self, message: str) -> bool:
+        """Log a failure and record it as the error of the running pipeline check"""
+        self.log(f"✗ {message}")
+        step = getattr(self._step, 'name', None)
+        if step:
+            self.errors.setdefault(step, message)
+        return False
+    
+    def connect_primary(self) -> bool:
+        """Establish connection to the primary database"""
         try:
-            # Connect to primary
             self.primary_conn = psycopg2.connect(**self.primary_config)
             self.primary_conn.autocommit = True
-            print("✓ Connected to primary database")
-            
-            # Connect to replica
+            self.log("✓ Connected to primary database")
+            return True
+        except Exception as e:
+            return self.fail(f"Primary connection failed: {e}")
+    
+    def connect_replica(self) -> bool:
+        """Establish connection to the replica database"""
+        try:
             self.replica_conn = psycopg2.connect(**self.replica_config)
             self.replica_conn.autocommit = True
-            print("✓ Connected to replica database")
-            
+            self.log("✓ Connected to replica database")
             return True
         except Exception as e:
-            print(f"✗ Database connection failed: {e}")
-            return False
+            return self.fail(f"Replica connection failed: {e}")
     
-    def verify_replication_setup(self) -> bool:
-        """Verify that replication is properly configured"""
+    def connect_databases(self) -> bool:
+        """Establish connections to both primary and replica databases"""
+        return self.connect_primary() and self.connect_replica()
+    
+    def fetch_primary_catalog(self) -> bool:
+        """Fetch the primary catalog state checked by verification in one round trip"""
         try:
-            # Check primary database settings
             with self.primary_conn.cursor() as cur:
-                cur.execute("SHOW wal_level;")
-                wal_level = cur.fetchone()[0]
-                if wal_level != 'logical':
-                    print(f"✗ WAL level is {wal_level}, should be 'logical'")
-                    return False
-                print(f"✓ WAL level: {wal_level}")
-                
-                # Check replication slots
-                cur.execute("SELECT COUNT(*) FROM pg_replication_slots WHERE active = true;")
-                active_slots = cur.fetchone()[0]
-                print(f"✓ Active replication slots: {active_slots}")
-                
-                # Check publication
-                cur.execute("SELECT COUNT(*) FROM pg_publication WHERE pubname = 'my_publication';")
-                publications = cur.fetchone()[0]
-                if publications == 0:
-                    print("✗ Publication 'my_publication' not found")
-                    return False
-                print("✓ Publication 'my_publication' exists")
-            
-            # Check replica database
+                cur.execute("""
+                    SELECT 
+                        current_setting('wal_level'),
+                        (SELECT COUNT(*) FROM pg_replication_slots WHERE active = true),
+                        EXISTS (SELECT 1 FROM pg_publication WHERE pubname = 'my_publication');
+                """)
+                row = cur.fetchone()
+                self.catalog['primary'] = {
+                    'wal_level': row[0],
+                    'active_slots': row[1],
+                    'publication_exists': row[2]
+                }
+            return True
+        except Exception as e:
+            return self.fail(f"Failed to read primary catalog: {e}")
+    
+    def fetch_replica_catalog(self) -> bool:
+        """Fetch the replica catalog state checked by verification in one round trip"""
+        try:
             with self.replica_conn.cursor() as cur:
-                # Check subscription
-                cur.execute("SELECT COUNT(*) FROM pg_subscription WHERE subname = 'my_subscription';")
-                subscriptions = cur.fetchone()[0]
-                if subscriptions == 0:
-                    print("✗ Subscription 'my_subscription' not found")
-                    return False
-                print("✓ Subscription 'my_subscription' exists")
-                
-                # Check subscription status
                 cur.execute("""
-                    SELECT subname, pid, received_lsn, latest_end_lsn 
-                    FROM pg_stat_subscription 
-                    WHERE subname = 'my_subscription';
+                    SELECT 
+                        EXISTS (SELECT 1 FROM pg_subscription WHERE subname = 'my_subscription'),
+                        (SELECT pid FROM pg_stat_subscription WHERE subname = 'my_subscription' LIMIT 1);
                 """)
-                sub_stats = cur.fetchone()
-                if sub_stats and sub_stats[1]:  # pid is not None
-                    print(f"✓ Subscription worker running (PID: {sub_stats[1]})")
-                else:
-                    print("⚠ Subscription worker not running")
+                row = cur.fetchone()
+                self.catalog['replica'] = {
+                    'subscription_exists': row[0],
+                    'worker_pid': row[1]
+                }
+            return True
+        except Exception as e:
+            return self.fail(f"Failed to read replica catalog: {e}")
+    
+    def verify_replication_setup(self) -> bool:
+        """Verify that replication is properly configured"""
+        try:
+            if 'primary' not in self.catalog and not self.fetch_primary_catalog():
+                return False
+            if 'replica' not in self.catalog and not self.fetch_replica_catalog():
+                return False
+            primary = self.catalog['primary']
+            replica = self.catalog['replica']
+            
+            # Check primary database settings
+            wal_level = primary['wal_level']
+            if wal_level != 'logical':
+                return self.fail(f"WAL level is {wal_level}, should be 'logical'")
+            self.log(f"✓ WAL level: {wal_level}")
+            
+            # Check replication slots
+            self.log(f"✓ Active replication slots: {primary['active_slots']}")
+            
+            # Check publication
+            if not primary['publication_exists']:
+                return self.fail("Publication 'my_publication' not found")
+            self.log("✓ Publication 'my_publication' exists")
+            
+            # Check subscription
+            if not replica['subscription_exists']:
+                return self.fail("Subscription 'my_subscription' not found")
+            self.log("✓ Subscription 'my_subscription' exists")
+            
+            # Check subscription status
+            if replica['worker_pid']:
+                self.log(f"✓ Subscription worker running (PID: {replica['worker_pid']})")
+            else:
+                self.log("⚠ Subscription worker not running")
             
             return True
         except Exception as e:
-            print(f"✗ Replication verification failed: {e}")
-            return False
+            return self.fail(f"Replication verification failed: {e}")
     
-    def test_data_replication(self) -> bool:
+    def test_data_replication(self, timeout: int = 10) -> bool:
         """Test actual data replication by inserting test records"""
         test_table = "replication_test"
         
@@ -103,7 +162,7 @@ class ReplicationTester:
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     );
                 """)
-                print(f"✓ Created test table '{test_table}' on primary")
+                self.log(f"✓ Created test table '{test_table}' on primary")
             
             # Create test table on replica (structure only)
             with self.replica_conn.cursor() as cur:
@@ -114,7 +173,7 @@ class ReplicationTester:
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     );
                 """)
-                print(f"✓ Created test table '{test_table}' on replica")
+                self.log(f"✓ Created test table '{test_table}' on replica")
             
             # Insert test data on primary
             test_value = f"test_data_{int(time.time())}"
@@ -124,30 +183,28 @@ class ReplicationTester:
                     (test_value,)
                 )
                 test_id = cur.fetchone()[0]
-                print(f"✓ Inserted test record with ID {test_id} on primary")
+                self.log(f"✓ Inserted test record with ID {test_id} on primary")
             
-            # Wait for replication
-            print("⏳ Waiting for replication (10 seconds)...")
-            time.sleep(10)
-            
-            # Verify data on replica
-            with self.replica_conn.cursor() as cur:
-                cur.execute(
-                    f"SELECT test_data FROM {test_table} WHERE id = %s;",
-                    (test_id,)
-                )
-                result = cur.fetchone()
+            # Poll the replica until the record arrives
+            self.log(f"⏳ Waiting for replication (up to {timeout} seconds)...")
+            deadline = time.time() + timeout
+            while True:
+                with self.replica_conn.cursor() as cur:
+                    cur.execute(
+                        f"SELECT test_data FROM {test_table} WHERE id = %s;",
+                        (test_id,)
+                    )
+                    result = cur.fetchone()
                 
                 if result and result[0] == test_value:
-                    print(f"✓ Test data replicated successfully: {test_value}")
+                    self.log(f"✓ Test data replicated successfully: {test_value}")
                     return True
-                else:
-                    print(f"✗ Test data not found on replica")
-                    return False
+                if time.time() >= deadline:
+                    return self.fail("Test data not found on replica")
+                time.sleep(0.5)
                     
         except Exception as e:
-            print(f"✗ Data replication test failed: {e}")
-            return False
+            return self.fail(f"Data replication test failed: {e}")
         finally:
             # Cleanup test table
             try:
@@ -155,7 +212,7 @@ class ReplicationTester:
                     cur.execute(f"DROP TABLE IF EXISTS {test_table};")
                 with self.replica_conn.cursor() as cur:
                     cur.execute(f"DROP TABLE IF EXISTS {test_table};")
-                print(f"✓ Cleaned up test table '{test_table}'")
+                self.log(f"✓ Cleaned up test table '{test_table}'")
             except:
                 pass
     
@@ -171,13 +228,13 @@ class ReplicationTester:
                 result = cur.fetchone()
                 if result and result[0] is not None:
                     lag_seconds = float(result[0])
-                    print(f"✓ Current replication lag: {lag_seconds:.2f} seconds")
+                    self.log(f"✓ Current replication lag: {lag_seconds:.2f} seconds")
                     return lag_seconds
                 else:
-                    print("⚠ Unable to measure replication lag")
+                    self.log("⚠ Unable to measure replication lag")
                     return None
         except Exception as e:
-            print(f"✗ Failed to measure replication lag: {e}")
+            self.fail(f"Failed to measure replication lag: {e}")
             return None
     
     def get_replication_stats(self) -> Dict:
@@ -187,31 +244,23 @@ class ReplicationTester:
         try:
             # Primary statistics
             with self.primary_conn.cursor() as cur:
-                # WAL statistics
                 cur.execute("""
                     SELECT 
                         pg_current_wal_lsn() as current_wal_lsn,
-                        pg_size_pretty(pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')) as total_wal_size;
+                        pg_size_pretty(pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')) as total_wal_size,
+                        (SELECT COALESCE(json_agg(json_build_object(
+                                    'name', slot_name,
+                                    'active', active,
+                                    'lag_size', pg_size_pretty(pg_wal_lsn_diff(pg_current_wal_lsn(), restart_lsn))
+                                )), '[]'::json)
+                         FROM pg_replication_slots) as replication_slots;
                 """)
                 wal_stats = cur.fetchone()
                 stats['primary'] = {
                     'current_wal_lsn': wal_stats[0],
-                    'total_wal_size': wal_stats[1]
+                    'total_wal_size': wal_stats[1],
+                    'replication_slots': wal_stats[2]
                 }
-                
-                # Replication slot statistics
-                cur.execute("""
-                    SELECT 
-                        slot_name,
-                        active,
-                        pg_size_pretty(pg_wal_lsn_diff(pg_current_wal_lsn(), restart_lsn)) as lag_size
-                    FROM pg_replication_slots;
-                """)
-                slots = cur.fetchall()
-                stats['primary']['replication_slots'] = [
-                    {'name': slot[0], 'active': slot[1], 'lag_size': slot[2]}
-                    for slot in slots
-                ]
             
             # Replica statistics
             with self.replica_conn.cursor() as cur:
@@ -238,40 +287,100 @@ class ReplicationTester:
             
             return stats
         except Exception as e:
-            print(f"✗ Failed to get replication stats: {e}")
+            self.fail(f"Failed to get replication stats: {e}")
             return {}
     
-    def run_complete_test(self) -> bool:
-        """Run complete test suite"""
-        print("🚀 Starting PostgreSQL Logical Replication Test Suite")
-        print("=" * 60)
+    def collect_replication_stats(self) -> bool:
+        """Pipeline step wrapping get_replication_stats"""
+        self.stats = self.get_replication_stats()
+        return bool(self.stats)
+    
+    def lag_check(self) -> bool:
+        """Pipeline step wrapping measure_replication_lag; an unknown lag is not a failure"""
+        self.measure_replication_lag()
+        return True
+    
+    def pipeline(self) -> List[Tuple[str, Callable[[], bool], List[str]]]:
+        """Checks as (name, function, dependencies); checks without a path between them run concurrently"""
+        return [
+            ('connect_primary', self.connect_primary, []),
+            ('connect_replica', self.connect_replica, []),
+            ('primary_catalog', self.fetch_primary_catalog, ['connect_primary']),
+            ('replica_catalog', self.fetch_replica_catalog, ['connect_replica']),
+            ('verify_replication_setup', self.verify_replication_setup, ['primary_catalog', 'replica_catalog']),
+            ('data_replication', self.test_data_replication, ['verify_replication_setup']),
+            ('replication_lag', self.lag_check, ['data_replication']),
+            ('replication_stats', self.collect_replication_stats, ['data_replication']),
+        ]
+    
+    def run_pipeline(self, max_workers: int = 4) -> List[Dict]:
+        """Run the check pipeline, starting each check as soon as its dependencies pass"""
+        steps = {name: (func, deps) for name, func, deps in self.pipeline()}
+        results = {}
+        running = {}
         
-        # Connect to databases
-        if not self.connect_databases():
-            return False
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while len(results) < len(steps):
+                for name, (func, deps) in steps.items():
+                    if name in results or name in running.values():
+                        continue
+                    if any(results.get(dep, {}).get('status') in ('failed', 'skipped') for dep in deps):
+                        results[name] = {'name': name, 'status': 'skipped', 'duration': 0.0,
+                                         'message': 'dependency did not pass'}
+                    elif all(dep in results for dep in deps):
+                        running[executor.submit(self._timed, name, func)] = name
+                
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    passed, duration, error = future.result()
+                    results[name] = {
+                        'name': name,
+                        'status': 'passed' if passed else 'failed',
+                        'duration': duration,
+                        'message': error
+                    }
         
-        # Verify replication setup
-        print("\n📋 Verifying replication setup...")
-        if not self.verify_replication_setup():
-            return False
+        # Report in pipeline order rather than completion order
+        self.results = [results[name] for name in steps]
+        return self.results
+    
+    def _timed(self, name: str, func: Callable[[], bool]) -> Tuple[bool, float, Optional[str]]:
+        self._step.name = name
+        started = time.perf_counter()
+        try:
+            passed = bool(func())
+            return passed, time.perf_counter() - started, None if passed else self.errors.get(name)
+        except Exception as e:
+            return False, time.perf_counter() - started, str(e)
+        finally:
+            self._step.name = None
+    
+    def run_complete_test(self) -> bool:
+        """Run complete test suite"""
+        self.log("🚀 Starting PostgreSQL Logical Replication Test Suite")
+        self.log("=" * 60)
         
-        # Test data replication
-        print("\n🔄 Testing data replication...")
-        if not self.test_data_replication():
-            return False
+        started = time.perf_counter()
+        results = self.run_pipeline()
+        elapsed = time.perf_counter() - started
         
-        # Measure replication lag
-        print("\n⏱️  Measuring replication lag...")
-        self.measure_replication_lag()
+        if self.stats:
+            self.log("📊 Replication statistics:\n" + json.dumps(self.stats, indent=2, default=str))
         
-        # Get comprehensive stats
-        print("\n📊 Gathering replication statistics...")
-        stats = self.get_replication_stats()
-        if stats:
-            print(json.dumps(stats, indent=2, default=str))
+        self.log("⏱️  Check timings:")
+        for result in results:
+            icon = {'passed': '✓', 'failed': '✗', 'skipped': '⚠'}[result['status']]
+            self.log(f"   {icon} {result['name']}: {result['status']} ({result['duration']:.2f}s)")
         
-        print("\n✅ All tests completed successfully!")
-        return True
+        success = all(result['status'] == 'passed' for result in results)
+        if success:
+            self.log(f"✅ All tests completed successfully in {elapsed:.2f}s!")
+        else:
+            self.log(f"❌ Tests failed after {elapsed:.2f}s")
+        return success
     
     def close_connections(self):
         """Close database connections"""
@@ -280,8 +389,83 @@ class ReplicationTester:
         if self.replica_conn:
             self.replica_conn.close()
 
+def validate_cluster(name: Optional[str], primary_config: Dict, replica_config: Dict) -> Dict:
+    """Validate a single primary/replica pair and return its report"""
+    tester = ReplicationTester(primary_config, replica_config, name)
+    started = time.perf_counter()
+    try:
+        success = tester.run_complete_test()
+    finally:
+        tester.close_connections()
+    
+    return {
+        'name': name or primary_config['host'],
+        'success': success,
+        'duration': time.perf_counter() - started,
+        'checks': tester.results,
+        'stats': tester.stats
+    }
+
+def validate_clusters(clusters: List[Dict], max_workers: int = 8) -> List[Dict]:
+    """Validate many clusters in parallel"""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(validate_cluster, cluster['name'], cluster['primary'], cluster['replica'])
+            for cluster in clusters
+        ]
+        return [future.result() for future in futures]
+
+def write_junit_report(reports: List[Dict], path: str):
+    """Write cluster reports as JUnit XML, one testsuite per cluster"""
+    suites = ET.Element('testsuites', name='replication-validation')
+    
+    for report in reports:
+        checks = report['checks']
+        suite = ET.SubElement(
+            suites, 'testsuite',
+            name=report['name'],
+            tests=str(len(checks)),
+            failures=str(sum(1 for check in checks if check['status'] == 'failed')),
+            skipped=str(sum(1 for check in checks if check['status'] == 'skipped')),
+            time=f"{report['duration']:.3f}"
+        )
+        for check in checks:
+            case = ET.SubElement(
+                suite, 'testcase',
+                classname=report['name'], name=check['name'], time=f"{check['duration']:.3f}"
+            )
+            if check['status'] == 'failed':
+                ET.SubElement(case, 'failure', message=check['message'] or f"{check['name']} failed")
+            elif check['status'] == 'skipped':
+                ET.SubElement(case, 'skipped', message=check['message'])
+    
+    ET.ElementTree(suites).write(path, encoding='utf-8', xml_declaration=True)
+
+def load_clusters(path: str, defaults: Dict) -> List[Dict]:
+    """Load cluster definitions, filling unset connection settings from the environment defaults"""
+    with open(path) as f:
+        clusters = json.load(f)
+    
+    loaded = []
+    for cluster in clusters:
+        primary = {**defaults['primary'], **cluster.get('primary', {})}
+        replica = {**defaults['replica'], **cluster.get('replica', {})}
+        loaded.append({'name': cluster.get('name', primary['host']), 'primary': primary, 'replica': replica})
+    return loaded
+
 def main():
     """Main function to run replication tests"""
+    parser = argparse.ArgumentParser(description='PostgreSQL Replication Tester')
+    parser.add_argument('--clusters', type=str,
+                        help='JSON file listing clusters as {"name", "primary": {...}, "replica": {...}}')
+    parser.add_argument('--workers', type=int, default=8, help='Clusters validated in parallel (default: 8)')
+    parser.add_argument('--junit', type=str, help='Output file for a JUnit XML report')
+    parser.add_argument('--json', type=str, help='Output file for a JSON report')
+    
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    
     # Database configuration
     primary_config = {
         'host': os.getenv('PRIMARY_HOST', 'localhost'),
@@ -301,20 +485,34 @@ def main():
         'sslmode': 'require'
     }
     
-    # Print configuration (without passwords)
-    print("Configuration:")
-    print(f"Primary: {primary_config['host']}:{primary_config['port']}")
-    print(f"Replica: {replica_config['host']}:{replica_config['port']}")
-    print(f"Database: {primary_config['database']}")
-    print()
+    if args.clusters:
+        clusters = load_clusters(args.clusters, {'primary': primary_config, 'replica': replica_config})
+        print(f"Validating {len(clusters)} clusters ({args.workers} in parallel)")
+        print()
+        reports = validate_clusters(clusters, args.workers)
+    else:
+        # Print configuration (without passwords)
+        print("Configuration:")
+        print(f"Primary: {primary_config['host']}:{primary_config['port']}")
+        print(f"Replica: {replica_config['host']}:{replica_config['port']}")
+        print(f"Database: {primary_config['database']}")
+        print()
+        
+        # Run tests
+        reports = [validate_cluster(None, primary_config, replica_config)]
+    
+    if len(reports) > 1:
+        print(f"\n{'='*60}")
+        for report in reports:
+            print(f"{'✅' if report['success'] else '❌'} {report['name']} ({report['duration']:.2f}s)")
     
-    # Run tests
-    tester = ReplicationTester(primary_config, replica_config)
-    try:
-        success = tester.run_complete_test()
-        sys.exit(0 if success else 1)
-    finally:
-        tester.close_connections()
+    if args.junit:
+        write_junit_report(reports, args.junit)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2, default=str)
+    
+    sys.exit(0 if all(report['success'] for report in reports) else 1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from monitoring import analyze_decoding_history, recommend_decoding_settings, DECODING_COUNTERS
+
+
+def sample(spill_txns: int, total_txns: int, stats_reset=None):
+    slot = {counter: 0 for counter in DECODING_COUNTERS}
+    slot.update({
+        'slot_name': 'my_subscription',
+        'stats_reset': stats_reset,
+        'spill_txns': spill_txns,
+        'spill_bytes': spill_txns * 100 * 1024 * 1024,
+        'total_txns': total_txns,
+        'rates': {}
+    })
+    return {'replication_lag_seconds': None, 'decoding_stats': [slot]}
+
+
+def test_counters_going_down_are_treated_as_a_reset():
+    # The slot is recreated between the 2nd and 3rd sample without stats_reset changing
+    samples = [sample(100, 1000), sample(110, 1100), sample(2, 10), sample(5, 60)]
+
+    summary = analyze_decoding_history(samples)['slots']['my_subscription']
+
+    assert summary['spill_txns'] == 10 + 3
+    assert summary['total_txns'] == 100 + 50
+
+
+def test_reset_does_not_produce_recommendations_from_negative_totals():
+    samples = [sample(100, 1000), sample(100, 1000), sample(2, 10)]
+    parameter_group = {'family': 'aurora-postgresql15', 'parameters': {'logical_decoding_work_mem': '65536'}}
+
+    recommendations = recommend_decoding_settings(analyze_decoding_history(samples), parameter_group)
+
+    assert recommendations['slots']['my_subscription']['action'] == 'keep'
+    assert recommendations['recommended_logical_decoding_work_mem_kb'] == 65536
+
+
+def test_stats_reset_change_starts_a_new_baseline():
+    samples = [sample(10, 100, '2026-01-01'), sample(20, 200, '2026-01-02'), sample(25, 250, '2026-01-02')]
+
+    summary = analyze_decoding_history(samples)['slots']['my_subscription']
+
+    assert summary['spill_txns'] == 5
@@ -0,0 +1,129 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from monitoring import MetricsHistory
+
+
+def sample(timestamp: datetime, lag: float = 1.0):
+    return {'timestamp': timestamp.isoformat(), 'replication_lag_seconds': lag, 'decoding_stats': [], 'alerts': []}
+
+
+def line_count(path: str) -> int:
+    with open(path) as f:
+        return sum(1 for line in f if line.strip())
+
+
+@pytest.fixture
+def history(tmp_path):
+    return MetricsHistory(str(tmp_path / 'metrics.jsonl'), raw_retention=timedelta(hours=2))
+
+
+def test_bucket_boundaries(history):
+    start = datetime(2026, 1, 1, 10, 58, 0)
+    for seconds in (0, 30, 60, 90, 119, 120, 150):
+        history.append(sample(start + timedelta(seconds=seconds)))
+
+    # 11:00:00 is the first instant of both the 11:00 minute and the 11:00 hour
+    written = history.rollup(now=datetime(2026, 1, 1, 11, 0, 45))
+
+    minutes = history._read(history.tier_files['1m'])
+    assert [record['timestamp'] for record in minutes] == ['2026-01-01T10:58:00', '2026-01-01T10:59:00']
+    assert [record['samples'] for record in minutes] == [2, 3]
+
+    hours = history._read(history.tier_files['1h'])
+    assert [record['timestamp'] for record in hours] == ['2026-01-01T10:00:00']
+    assert hours[0]['samples'] == 5
+    assert written['1m'] == 2 and written['1h'] == 1
+
+
+def test_rollup_is_idempotent(history, tmp_path):
+    start = datetime(2026, 1, 1, 10, 0, 0)
+    for i in range(240):
+        history.append(sample(start + timedelta(seconds=30 * i), lag=i))
+    now = datetime(2026, 1, 1, 12, 0, 10)
+
+    history.rollup(now=now)
+    counts = {tier: line_count(path) for tier, path in history.tier_files.items()}
+
+    assert history.rollup(now=now) == {'1m': 0, '1h': 0, 'raw_expired': 0, '1m_expired': 0}
+
+    # A restarted monitor resumes from the last rolled bucket in each tier
+    restarted = MetricsHistory(history.raw_file, raw_retention=timedelta(hours=2))
+    assert restarted.rollup(now=now)['1m'] == 0
+    assert {tier: line_count(path) for tier, path in history.tier_files.items()} == counts
+    assert counts == {'1m': 120, '1h': 2}
+
+
+def test_raw_samples_kept_until_hourly_tier_covers_them(history, monkeypatch):
+    start = datetime(2026, 1, 1, 6, 0, 0)
+    for i in range(6 * 60):
+        history.append(sample(start + timedelta(minutes=i)))
+    now = datetime(2026, 1, 1, 12, 0, 30)
+
+    # Without hourly rollups nothing is covered, so nothing may expire
+    last_timestamp = history._last_timestamp
+    monkeypatch.setattr(
+        history, '_last_timestamp',
+        lambda path: None if path == history.tier_files['1h'] else last_timestamp(path)
+    )
+    monkeypatch.setattr(history, 'TIERS', {'1m': timedelta(minutes=1)})
+    assert history.rollup(now=now)['raw_expired'] == 0
+    assert line_count(history.raw_file) == 6 * 60
+    monkeypatch.undo()
+
+    history.rollup(now=now)
+    hours = {record['timestamp'] for record in history._read(history.tier_files['1h'])}
+    raw = history._read(history.raw_file)
+
+    # Expired hours are in the hourly tier and everything inside retention is still raw
+    oldest = datetime.fromisoformat(raw[0]['timestamp'])
+    assert oldest == datetime(2026, 1, 1, 10, 1, 0)
+    for hour in range(6, 10):
+        assert datetime(2026, 1, 1, hour).isoformat() in hours
+    assert len(raw) == 119
+
+
+def test_expiry_waits_for_a_full_step(history):
+    start = datetime(2026, 1, 1, 6, 0, 0)
+    for i in range(4 * 60):
+        history.append(sample(start + timedelta(minutes=i)))
+
+    # The oldest sample is older than the cutoff, but by less than a full expiry step
+    history.rollup(now=datetime(2026, 1, 1, 8, 30, 0))
+    assert line_count(history.raw_file) == 4 * 60
+
+    # Once it is a full step older, all aged samples are removed in one rewrite
+    assert history.rollup(now=datetime(2026, 1, 1, 9, 0, 30))['raw_expired'] == 61
+    assert history._first_timestamp(history.raw_file) == datetime(2026, 1, 1, 7, 1, 0)
+
+
+def test_retention_must_cover_hourly_bucket(tmp_path):
+    with pytest.raises(ValueError):
+        MetricsHistory(str(tmp_path / 'metrics.jsonl'), raw_retention=timedelta(hours=1))
+
+
+def test_malformed_lines_are_skipped_and_dropped_on_expiry(history):
+    start = datetime(2026, 1, 1, 6, 0, 0)
+    history.append(sample(start))
+    # A record cut short by a killed monitor, then pretty-printed --once output
+    with open(history.raw_file, 'a') as f:
+        f.write('{"timestamp": "2026-01-01T06:00:30", "replication_la')
+    history.append(sample(start + timedelta(minutes=1)))
+    with open(history.raw_file, 'a') as f:
+        f.write('{\n  "timestamp": "2026-01-01T06:01:30",\n  "alerts": []\n}\n')
+    for i in range(2, 4 * 60):
+        history.append(sample(start + timedelta(minutes=i)))
+
+    written = history.rollup(now=datetime(2026, 1, 1, 9, 0, 30))
+
+    assert history.skipped_lines == 5
+    assert history._read(history.tier_files['1m'])[0]['samples'] == 1
+    assert written['raw_expired'] == 61
+    with open(history.raw_file) as f:
+        assert all(history._parse(line) for line in f)
+    assert line_count(history.raw_file) == 4 * 60 - 61
@@ -0,0 +1,73 @@
+import importlib.util
+import os
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts', 'publication-sharding.py')
+
+
+@pytest.fixture(scope='module')
+def sharding():
+    spec = importlib.util.spec_from_file_location('publication_sharding', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize('conninfo, expected', [
+    ('host=h user=replicator password=ReplicationPass123! sslmode=require',
+     'host=h user=replicator password=******** sslmode=require'),
+    ("host=h password = 'a b\\' c' port=5432", 'host=h password = ******** port=5432'),
+    ('postgresql://replicator:secret@h:5432/db?sslmode=require',
+     'postgresql://replicator:********@h:5432/db?sslmode=require'),
+    ('postgres://replicator@h/db?sslmode=require&password=secret',
+     'postgres://replicator@h/db?sslmode=require&password=********'),
+    ('postgresql://replicator@h/db', 'postgresql://replicator@h/db'),
+])
+def test_mask_password(sharding, conninfo, expected):
+    assert sharding.mask_password(conninfo) == expected
+
+
+def test_group_related_tables_keeps_foreign_keys_together(sharding):
+    tables = [('public', name) for name in ('departments', 'employees', 'projects', 'tasks')]
+    foreign_keys = [
+        (('public', 'projects'), ('public', 'departments')),
+        (('public', 'tasks'), ('public', 'projects')),
+        # Keys to tables outside the publication do not join groups
+        (('public', 'employees'), ('audit', 'people')),
+    ]
+
+    groups = sharding.group_related_tables(tables, foreign_keys)
+
+    assert sorted(groups) == [
+        [('public', 'departments'), ('public', 'projects'), ('public', 'tasks')],
+        [('public', 'employees')],
+    ]
+
+
+def test_plan_shards_balances_by_volume(sharding):
+    groups = [[('public', 'a')], [('public', 'b')], [('public', 'c'), ('public', 'd')], [('public', 'e')]]
+    volumes = {('public', 'a'): 60, ('public', 'b'): 50, ('public', 'c'): 20, ('public', 'd'): 20, ('public', 'e'): 10}
+
+    plan = sharding.plan_shards(groups, volumes, 2)
+
+    assert sorted(shard['changes_per_sec'] for shard in plan) == [70, 90]
+    assert sorted(len(shard['tables']) for shard in plan) == [2, 3]
+
+
+def test_plan_shards_drops_empty_shards(sharding):
+    plan = sharding.plan_shards([[('public', 'a'), ('public', 'b')]], {}, 3)
+
+    assert len(plan) == 1
+
+
+def test_subscription_options_follow_server_version(sharding):
+    pg15 = {'subbinary': True, 'substream': True, 'subtwophasestate': 'd',
+            'subdisableonerr': False, 'subsynccommit': 'off'}
+    assert sharding.subscription_options(pg15) == [
+        'binary = true', 'streaming = on', 'two_phase = false',
+        'disable_on_error = false', "synchronous_commit = 'off'",
+    ]
+
+    pg16 = {'subbinary': False, 'substream': 'p', 'suborigin': 'any'}
+    assert sharding.subscription_options(pg16) == ['binary = false', 'streaming = parallel', 'origin = any']